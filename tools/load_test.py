@@ -0,0 +1,513 @@
+"""
+端到端压测：在一个进程里用 Streamlit AppTest 模拟 N 个并发用户，走真实的 app.py 页面逻辑。
+上游换成 tools/mock_upstream.py，数据库默认用 mongomock (也可以指向本地 mongod)，不碰线上 API 和 Atlas。
+
+报告内容：
+  - 每类操作的页面重跑耗时分位数 (p50 / p90 / p99，从点击到页面稳定)
+  - 每个页面单次重跑的耗时 (应用自己在 /metrics 里记的，不含视频页轮询时的等待)
+  - 每个用户每分钟调用上游多少次 (按接口)
+  - 每类操作平均读写数据库多少次、多少字节 (后台线程的读写单独列出)
+
+视频页在有任务进行时会一直等待、重跑，AppTest 的一次 run() 要等到任务全部完成才返回，
+所以客户端这边记的 video_until_done 是"提交到视频生成完"，主要取决于假上游的 --video-seconds；
+提交后页面单次重跑有多快看 /metrics 里的 video 页。
+
+用法：
+    pip install -r tools/requirements.txt
+    python tools/load_test.py --users 8 --duration 60
+    python tools/load_test.py --users 4 --mix chat=1 --mongo-uri mongodb://localhost:27017 --fail-p95 3.0
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import secrets
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import weakref
+
+import bson
+import pymongo
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_upstream import MockConfig, MockUpstream  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+DB_NAME = "ai_workbench_db"
+
+# 压测账号 (和 app.py 里的 USERS 保持一致；不用 admin，并发用户多于账号数时轮流复用，相当于多标签页)
+ACCOUNTS = [("guest", "123456"), ("vip", "vip666"), ("chunran", "123456"), ("zhixia", "654321"), ("yuehuan", "987654")]
+
+IMAGE_PROMPTS = ["赛博朋克风格的猫", "雪山下的小木屋", "海边日落", "复古火车站", "森林里的萤火虫"]
+VIDEO_PROMPTS = ["a cat walking in the rain", "drone shot over mountains", "city timelapse at night"]
+CHAT_PROMPTS = ["帮我写一个 3 个镜头的橘猫短视频分镜", "再来一版，换成雨天", "把第二个镜头改成特写"]
+
+PAGE_VIDEO, PAGE_IMAGE, PAGE_CHAT = "🎬 视频生成", "🎨 图片生成", "💬 智能对话"
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+
+
+class DbCounter:
+    """
+    统计数据库读写次数和字节数，按发起命令的操作分类 (线程安全)。
+    命令在哪个线程里执行就记到那个线程当前的操作上；写回队列、轮询器、对话生成这些后台线程记为 background。
+    """
+
+    BACKGROUND = "background"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}  # 操作 -> {"reads", "writes", "read_bytes", "write_bytes"}
+        self._local = threading.local()
+
+    def current_action(self):
+        return getattr(self._local, "action", None)
+
+    @contextlib.contextmanager
+    def attribute(self, action):
+        previous = self.current_action()
+        self._local.action = action
+        try:
+            yield
+        finally:
+            self._local.action = previous
+
+    def add(self, write, nbytes=0):
+        action = self.current_action() or self.BACKGROUND
+        with self.lock:
+            row = self.totals.setdefault(action, {"reads": 0, "writes": 0, "read_bytes": 0, "write_bytes": 0})
+            if write:
+                row["writes"] += 1
+                row["write_bytes"] += nbytes
+            else:
+                row["reads"] += 1
+                row["read_bytes"] += nbytes
+
+    def snapshot(self):
+        with self.lock:
+            return {action: dict(row) for action, row in self.totals.items()}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """真实 MongoDB：用 pymongo 命令监听统计每条命令的请求 / 响应大小"""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            self.counter.add(True, len(bson.encode(event.command)))
+
+    def succeeded(self, event):
+        if event.command_name in ("find", "getMore", "aggregate", "count"):
+            self.counter.add(False, len(bson.encode(event.reply)))
+
+    def failed(self, event):
+        pass
+
+
+def _encoded_size(obj):
+    """mongomock 模式下估算写操作的 BSON 大小 (UpdateOne 等批量操作取其过滤条件和文档)"""
+    if isinstance(obj, dict):
+        return len(bson.encode(obj))
+    if isinstance(obj, (list, tuple)):
+        return sum(_encoded_size(item) for item in obj)
+    return sum(_encoded_size(getattr(obj, attr)) for attr in ("_filter", "_doc") if isinstance(getattr(obj, attr, None), dict))
+
+
+def install_mongo_standin(counter):
+    """用 mongomock 顶替 pymongo.MongoClient：所有连接共享同一份内存数据，写操作按参数估算字节数"""
+    try:
+        import mongomock
+        import mongomock.gridfs
+    except ImportError:
+        sys.exit("需要 mongomock 作为本地数据库替身：pip install -r tools/requirements.txt (或用 --mongo-uri 指向本地 mongod)")
+    mongomock.gridfs.enable_gridfs_integration()
+    client = mongomock.MongoClient()
+
+    collection = mongomock.collection.Collection
+    for name in ("insert_one", "insert_many", "update_one", "update_many", "replace_one",
+                 "delete_one", "delete_many", "find_one_and_update", "bulk_write"):
+        original = getattr(collection, name)
+
+        def wrapper(self, *args, _original=original, **kwargs):
+            counter.add(True, _encoded_size(list(args)))
+            return _original(self, *args, **kwargs)
+        setattr(collection, name, wrapper)
+    for name in ("find", "aggregate", "count_documents"):
+        original = getattr(collection, name)
+
+        def wrapper(self, *args, _original=original, **kwargs):
+            counter.add(False)  # mongomock 不走网络，只统计次数
+            return _original(self, *args, **kwargs)
+        setattr(collection, name, wrapper)
+
+    pymongo.MongoClient = lambda *args, **kwargs: client
+    return client
+
+
+def allow_concurrent_apptests():
+    """
+    AppTest 每次 run() 都会设置、结束时清空全局的 Runtime 单例，多个用户并发重跑时会互相清掉。
+    这里让 Runtime 记住最近一次创建的实例，单例被清空的间隙里继续用它 (模拟的 Runtime 之间没有差别)。
+    同理 run() 期间临时打开的 global.appTest 配置在并发时会被提前还原，改成全程打开。
+    另外 AppTest 每次 run() 都新建脚本缓存、重新解析整个 app.py；真实服务只解析一次，这里也共用一个。
+    """
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(APP_PATH)  # 先在主线程编译好 (3.11 的 ast.parse 多线程同时调用会出错)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if last:
+            return last[0]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+
+
+def attribute_script_threads(counter):
+    """AppTest 在单独的脚本线程里跑 app.py：把发起这次 run() 的操作带进脚本线程，数据库命令才能记到对应操作上"""
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    init, run_script_thread = LocalScriptRunner.__init__, LocalScriptRunner._run_script_thread
+    actions = weakref.WeakKeyDictionary()
+
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        actions[self] = counter.current_action()  # 在模拟用户的线程里创建
+
+    def _run_script_thread(self):
+        with counter.attribute(actions.get(self)):
+            run_script_thread(self)
+
+    LocalScriptRunner.__init__ = __init__
+    LocalScriptRunner._run_script_thread = _run_script_thread
+
+
+def scrape_rerun_histograms(url):
+    """读应用 /metrics 里的页面重跑耗时直方图：{(页面, 结果): {桶上界: 累计次数}}，读不到返回空"""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            text = resp.read().decode("utf-8")
+    except OSError:
+        return {}
+    histograms = {}
+    for line in text.splitlines():
+        if not line.startswith("workbench_rerun_seconds_bucket{"):
+            continue
+        labels, _, value = line[len("workbench_rerun_seconds_bucket{"):].rpartition("} ")
+        fields = dict(part.split("=", 1) for part in labels.split(","))
+        fields = {k: v.strip('"') for k, v in fields.items()}
+        bound = float("inf") if fields["le"] == "+Inf" else float(fields["le"])
+        histograms.setdefault((fields["page"], fields["outcome"]), {})[bound] = float(value)
+    return histograms
+
+
+def histogram_quantile(buckets, q):
+    """按累计桶线性插值估算分位数 (和 Prometheus 的 histogram_quantile 一样)"""
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]] if bounds else 0
+    if not total:
+        return 0.0
+    rank, lower, seen = q * total, 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return lower  # 落在 +Inf 桶里，只能报最大的有限上界
+            return lower + (bound - lower) * (rank - seen) / max(count - seen, 1e-9)
+        lower, seen = bound, count
+    return lower
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}  # 操作 -> [秒]
+        self.errors = {}
+
+    def record(self, action, seconds):
+        with self.lock:
+            self.latencies.setdefault(action, []).append(seconds)
+
+    def error(self, action, message):
+        with self.lock:
+            self.errors.setdefault(action, []).append(message)
+
+    def action_count(self):
+        with self.lock:
+            return sum(len(v) for k, v in self.latencies.items() if k != "login")
+
+
+class VirtualUser:
+    """一个模拟用户：登录后按权重随机执行操作，直到压测结束"""
+
+    def __init__(self, index, account, mix, stats, counter, timeout, seed):
+        self.index = index
+        self.account = account
+        self.mix = mix
+        self.stats = stats
+        self.counter = counter
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.at = None
+        self.page = None
+
+    def _timed(self, action, step):
+        start = time.perf_counter()
+        try:
+            with self.counter.attribute(action):
+                step()
+        except Exception as e:
+            self.stats.error(action, f"{type(e).__name__}: {e}")
+            return False
+        self.stats.record(action, time.perf_counter() - start)
+        exceptions = list(self.at.exception)
+        if exceptions:
+            self.stats.error(action, exceptions[0].value)
+        return True
+
+    def _widget(self, elements, label):
+        for element in elements:
+            if element.label == label:
+                return element
+        raise LookupError(f"找不到控件: {label}")
+
+    def _goto(self, page):
+        if self.page != page:
+            self._timed("navigate", lambda: self.at.sidebar.radio[0].set_value(page).run(timeout=self.timeout))
+            self.page = page
+
+    def login(self):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+
+        def step():
+            self.at.run()
+            self.at.text_input[0].input(self.account[0])
+            self.at.text_input[1].input(self.account[1])
+            self.at.button[0].click().run()
+        self._timed("login", step)
+        self.page = PAGE_VIDEO
+
+    def video(self):
+        self._goto(PAGE_VIDEO)
+        button = self._widget(self.at.sidebar.button, "🚀 提交视频")
+        if button.disabled:
+            return  # 进行中的任务已满
+        self._widget(self.at.sidebar.text_area, "提示词").input(self.rng.choice(VIDEO_PROMPTS))
+        # 有任务进行时页面会等待、重跑直到全部完成才返回，这里量到的是"提交到生成完"，不是单次重跑
+        self._timed("video_until_done", lambda: button.click().run(timeout=self.timeout))
+
+    def image(self):
+        self._goto(PAGE_IMAGE)
+        self._widget(self.at.sidebar.text_area, "画面描述").input(self.rng.choice(IMAGE_PROMPTS))
+        self._timed("image", lambda: self._widget(self.at.sidebar.button, "🎨 开始绘图").click().run(timeout=self.timeout))
+
+    def chat(self):
+        self._goto(PAGE_CHAT)
+        self.at.text_area(key="input_area").input(self.rng.choice(CHAT_PROMPTS))
+        start = time.perf_counter()
+        if not self._timed("chat_send", lambda: self._widget(self.at.button, "发送 🚀").click().run(timeout=self.timeout)):
+            return
+        # 回复在后台线程生成，页面定时刷新直到生成结束
+        deadline = time.time() + self.timeout
+        while time.time() < deadline and self._generating():
+            time.sleep(0.3)
+            self._timed("chat_poll", lambda: self.at.run(timeout=self.timeout))
+        self.stats.record("chat_reply", time.perf_counter() - start)
+
+    def _generating(self):
+        state = self.at.session_state
+        messages = state["chat_sessions"][state["current_session_id"]].get("messages") or []
+        return bool(messages) and messages[-1].get("generating", False)
+
+    def run(self, deadline, think_time):
+        self.login()
+        actions, weights = zip(*self.mix.items())
+        while time.time() < deadline:
+            getattr(self, self.rng.choices(actions, weights)[0])()
+            time.sleep(self.rng.uniform(0, think_time))
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("video", "image", "chat"):
+            raise argparse.ArgumentTypeError(f"未知操作: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测 (AppTest + 假上游 + 本地数据库)")
+    parser.add_argument("--users", type=int, default=4, help="并发用户数")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长 (秒)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("video=1,image=1,chat=2"), help="操作权重，如 video=1,image=1,chat=2")
+    parser.add_argument("--think-time", type=float, default=1.0, help="两次操作之间的最长随机停顿 (秒)")
+    parser.add_argument("--timeout", type=float, default=120, help="单次页面重跑的超时 (秒)")
+    parser.add_argument("--mongo-uri", default="", help="本地 mongod 地址；不填则用 mongomock")
+    parser.add_argument("--upstream", default="", help="已启动的假上游地址；不填则在进程内启动一个")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--video-seconds", type=float, default=2.0)
+    parser.add_argument("--no-callback", action="store_true", help="不启用视频完成推送，只靠轮询")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default="", help="把结果另存为 JSON 文件")
+    parser.add_argument("--fail-p95", type=float, default=0.0, help="任一操作 p95 超过这么多秒就以非零状态退出 (CI 用)")
+    args = parser.parse_args()
+
+    upstream = None
+    base_url = args.upstream
+    if not base_url:
+        config = MockConfig(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                            token_rate=args.token_rate, ttft=args.ttft, video_seconds=args.video_seconds, seed=args.seed)
+        upstream = MockUpstream(config).start()
+        base_url = upstream.url
+
+    counter = DbCounter()
+    attribute_script_threads(counter)
+    if args.mongo_uri:
+        monitoring.register(CommandCounter(counter))
+        client = pymongo.MongoClient(args.mongo_uri)
+    else:
+        client = install_mongo_standin(counter)
+    # 压测账号的额度放开，避免中途被限额
+    for username, _ in ACCOUNTS:
+        client[DB_NAME].users.update_one({"_id": username}, {"$set": {"quota_limit": 10 ** 9}}, upsert=True)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    with socket.socket() as sock:  # 先占一个空闲端口给内嵌服务，回调地址要在启动前确定
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    os.environ.update({
+        "UPSTREAM_BASE_URL": base_url,
+        "MONGO_URI": args.mongo_uri or "mongodb://mongomock",
+        "JOURNAL_PATH": os.path.join(workdir, "journal.sqlite3"),
+        "VIDEO_CACHE_DIR": os.path.join(workdir, "videos"),
+        "BLOB_LOCAL_DIR": os.path.join(workdir, "blobs"),
+        "EMBEDDED_HTTP_PORT": str(port),
+        "EMBEDDED_HTTP_PUBLIC_URL": f"http://127.0.0.1:{port}",  # 假上游和压测在同一台机器，回调地址用本机即可
+        "VIDEO_CALLBACK_SECRET": "" if args.no_callback else secrets.token_hex(16),
+        "METRICS_TOKEN": "",
+    })
+    metrics_url = f"http://127.0.0.1:{port}/metrics"
+
+    allow_concurrent_apptests()
+    stats = LoadStats()
+    users = [VirtualUser(i, ACCOUNTS[i % len(ACCOUNTS)], args.mix, stats, counter, args.timeout, args.seed + i)
+             for i in range(args.users)]
+    deadline = time.time() + args.duration
+    if upstream:
+        upstream.reset_stats()
+    db_before = counter.snapshot()
+    reruns_before = scrape_rerun_histograms(metrics_url)  # 内嵌服务在第一次运行页面时才启动，这时一般还读不到
+    started = time.time()
+    threads = [threading.Thread(target=u.run, args=(deadline, args.think_time), name=f"vu-{u.index}") for u in users]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+
+    empty = {"reads": 0, "writes": 0, "read_bytes": 0, "write_bytes": 0}
+    reruns = {}
+    for key, buckets in scrape_rerun_histograms(metrics_url).items():
+        before = reruns_before.get(key, {})
+        reruns[key] = {bound: count - before.get(bound, 0) for bound, count in buckets.items()}
+    db = {}
+    for action, row in counter.snapshot().items():
+        before = db_before.get(action, {})
+        db[action] = {k: v - before.get(k, 0) for k, v in row.items()}
+    user_minutes = args.users * elapsed / 60
+    report = {
+        "users": args.users,
+        "seconds": round(elapsed, 1),
+        "latency": {
+            action: {"count": len(v), "p50": percentile(v, 50), "p90": percentile(v, 90),
+                     "p95": percentile(v, 95), "p99": percentile(v, 99), "max": max(v)}
+            for action, v in sorted(stats.latencies.items())
+        },
+        "upstream_per_user_minute": {name: n / user_minutes for name, n in sorted((upstream.stats() if upstream else {}).items())},
+        "rerun_by_page": {
+            f"{page}/{outcome}": {"count": int(buckets.get(float("inf"), 0)),
+                                  "p50": histogram_quantile(buckets, 0.5), "p95": histogram_quantile(buckets, 0.95)}
+            for (page, outcome), buckets in sorted(reruns.items()) if buckets.get(float("inf"))
+        },
+        # 每类操作平均每次的数据库读写；background 是整个压测期间后台线程的总数
+        "db_per_action": {
+            action: {
+                "reads": row["reads"] / n,
+                "writes": row["writes"] / n,
+                "write_bytes": row["write_bytes"] / n,
+                "read_bytes": row["read_bytes"] / n if args.mongo_uri else None,
+            }
+            for action, row in sorted({**{a: empty for a in stats.latencies if a != "chat_reply"}, **db}.items())
+            for n in [1 if action == DbCounter.BACKGROUND else max(len(stats.latencies.get(action, [])), 1)]
+        },
+        "errors": {action: len(v) for action, v in stats.errors.items()},
+    }
+
+    print(f"\n=== 压测结果: {args.users} 个用户, {elapsed:.0f} 秒, {stats.action_count()} 次操作 ===")
+    print(f"{'操作':<18}{'次数':>6}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for action, row in report["latency"].items():
+        print(f"{action:<18}{row['count']:>6}" + "".join(f"{row[k]:>8.2f}s" for k in ("p50", "p90", "p95", "p99", "max")))
+    if report["rerun_by_page"]:
+        print("\n页面单次重跑 (应用内计时，不含轮询等待；按直方图桶估算):")
+        print(f"{'页面/结果':<18}{'次数':>6}{'p50':>9}{'p95':>9}")
+        for key, row in report["rerun_by_page"].items():
+            print(f"{key:<18}{row['count']:>6}{row['p50']:>8.2f}s{row['p95']:>8.2f}s")
+    print("\n每用户每分钟上游调用:")
+    for name, rate in report["upstream_per_user_minute"].items():
+        print(f"  {name:<16}{rate:>8.2f}")
+    print("\n每次操作数据库 (background 为后台线程合计):")
+    for action, per in report["db_per_action"].items():
+        read_bytes = f", 读 {per['read_bytes']:.0f} 字节" if per["read_bytes"] is not None else ""
+        print(f"  {action:<18}读 {per['reads']:>7.1f} 次, 写 {per['writes']:>6.1f} 次, 写入 {per['write_bytes']:>9.0f} 字节{read_bytes}")
+    for action, messages in stats.errors.items():
+        print(f"⚠️ {action}: {len(messages)} 次出错，例如 {messages[0]}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.fail_p95:
+        # video_until_done 主要是在等假上游把视频"生成"完，不算页面慢
+        rows = [(a, row) for a, row in report["latency"].items() if a != "video_until_done"]
+        rows += [(f"page:{key}", row) for key, row in report["rerun_by_page"].items()]
+        slow = [a for a, row in rows if row["p95"] > args.fail_p95]
+        if slow:
+            print(f"❌ p95 超过 {args.fail_p95}s: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
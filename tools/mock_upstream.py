@@ -0,0 +1,249 @@
+"""
+本地假上游：实现 app.py 用到的三个接口，压测和本地调试时不用请求真实 API。
+
+    POST /v1/video/create       提交视频，返回 {"id"}；带 callback_url 时完成后主动推送通知
+    GET  /v1/video/query?id=    查询视频状态，完成后返回 video_url
+    POST /v1/chat/completions   stream=True 时按 token 速率输出 SSE，否则一次性返回 (绘图结果带一张小图)
+    GET  /files/<id>.mp4        假视频文件
+    GET  /stats                 各接口调用次数；POST /stats/reset 清零
+
+用法：
+    python tools/mock_upstream.py --port 9900 --latency 0.2 --failure-rate 0.02 --token-rate 40
+    UPSTREAM_BASE_URL=http://127.0.0.1:9900 streamlit run app.py
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from PIL import Image
+
+REPLY_TEXT = (
+    "好的，下面是分镜脚本。\n"
+    "【画面锚点】 电影感，暖色调，35mm 胶片质感\n"
+    "分镜1: 清晨的街道，一只橘猫从巷口走出 (Prompt: an orange cat walking out of an alley at dawn, cinematic)\n"
+    "分镜2: 猫跳上窗台，阳光洒在毛发上 (Prompt: the cat jumps onto a sunny windowsill, warm light)\n"
+    "分镜3: 特写猫眯起眼睛 (Prompt: close-up of the cat squinting happily)\n"
+    "【文案1】 清晨的第一缕阳光，属于最懂生活的你。\n"
+)
+
+
+class MockConfig:
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0, token_rate=50.0, ttft=0.3,
+                 video_seconds=5.0, video_bytes=256 * 1024, seed=None):
+        self.latency = latency              # 每个请求的基础延迟 (秒)
+        self.jitter = jitter                # 延迟随机抖动上限 (秒)
+        self.failure_rate = failure_rate    # 返回 500 的概率 (0~1)
+        self.token_rate = token_rate        # 流式回复的输出速率 (token/秒，这里一个字符算一个 token)
+        self.ttft = ttft                    # 流式回复的首 token 延迟 (秒)
+        self.video_seconds = video_seconds  # 视频从提交到完成要多久 (秒)
+        self.video_bytes = video_bytes      # 假视频文件大小
+        self.random = random.Random(seed)
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """客户端断开连接 (停止生成、连接池回收) 不算错误，不打印堆栈"""
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class MockUpstream:
+    """假上游服务本体，可以在压测脚本里直接 start() 在后台线程运行"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.tasks = {}   # task_id -> {"done_at", "failed", "callback_url"}
+        self.calls = {}   # 接口名 -> 调用次数
+        self.lock = threading.Lock()
+        self.image_data_uri = self._make_image()
+        self.video_data = bytes(range(256)) * (self.config.video_bytes // 256 + 1)
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                upstream._handle(self, "GET")
+
+            def do_POST(self):
+                upstream._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = QuietHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="mock-upstream", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.calls)
+
+    def reset_stats(self):
+        with self.lock:
+            self.calls.clear()
+
+    @staticmethod
+    def _make_image():
+        buf = io.BytesIO()
+        Image.new("RGB", (64, 64), (255, 140, 0)).save(buf, format="PNG")
+        return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+    # --- 请求分发 ---
+    def _handle(self, request, method):
+        parts = urlsplit(request.path)
+        body = {}
+        if method == "POST":
+            length = int(request.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(request.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._send_json(request, 400, {"error": "bad json"})
+
+        if parts.path == "/stats":
+            return self._send_json(request, 200, self.stats())
+        if parts.path == "/stats/reset":
+            self.reset_stats()
+            return self._send_json(request, 200, {})
+        if parts.path.startswith("/files/"):
+            return self._send(request, 200, self.video_data, "video/mp4")
+
+        routes = {
+            ("POST", "/v1/video/create"): ("video_create", self._video_create),
+            ("GET", "/v1/video/query"): ("video_query", self._video_query),
+            ("POST", "/v1/chat/completions"): (None, self._chat),
+        }
+        name, handler = routes.get((method, parts.path), (None, None))
+        if handler is None:
+            return self._send_json(request, 404, {"error": "not found"})
+        if name is None:
+            name = "chat_stream" if body.get("stream") else "chat"
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+        cfg = self.config
+        time.sleep(cfg.latency + cfg.random.uniform(0, cfg.jitter))
+        if cfg.random.random() < cfg.failure_rate:
+            return self._send_json(request, 500, {"error": "mock failure"})
+        handler(request, body, parse_qs(parts.query))
+
+    def _send(self, request, status, data, content_type):
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _send_json(self, request, status, obj):
+        self._send(request, status, json.dumps(obj, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    # --- 视频 ---
+    def _video_create(self, request, body, query):
+        task_id = str(uuid.uuid4())
+        task = {"done_at": time.time() + self.config.video_seconds,
+                "failed": self.config.random.random() < self.config.failure_rate,
+                "callback_url": body.get("callback_url")}
+        with self.lock:
+            self.tasks[task_id] = task
+        if task["callback_url"]:
+            timer = threading.Timer(self.config.video_seconds, self._notify, args=(task_id,))
+            timer.daemon = True
+            timer.start()
+        self._send_json(request, 200, {"id": task_id})
+
+    def _video_result(self, task_id):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if time.time() < task["done_at"]:
+            return {"id": task_id, "status": "processing"}
+        if task["failed"]:
+            return {"id": task_id, "status": "failed"}
+        return {"id": task_id, "status": "succeeded", "video_url": f"{self.url}/files/{task_id}.mp4"}
+
+    def _video_query(self, request, body, query):
+        result = self._video_result(query.get("id", [""])[0])
+        if result is None:
+            return self._send_json(request, 404, {"error": "task not found"})
+        self._send_json(request, 200, result)
+
+    def _notify(self, task_id):
+        """视频完成后推送到提交时登记的回调地址 (假通知方)"""
+        task = self.tasks[task_id]
+        with self.lock:
+            self.calls["video_callback"] = self.calls.get("video_callback", 0) + 1
+        try:
+            requests.post(task["callback_url"], json=self._video_result(task_id), timeout=5)
+        except requests.RequestException as e:
+            print(f"⚠️ 回调推送失败 ({task_id}): {e}")
+
+    # --- 对话 / 绘图 ---
+    def _chat(self, request, body, query):
+        if not body.get("stream"):
+            prompt = (body.get("messages") or [{}])[-1].get("content")
+            content = f"![image]({self.image_data_uri}) 已根据描述生成: {str(prompt)[:40]}"
+            return self._send_json(request, 200, {"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+
+        def write_chunk(data):
+            request.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            request.wfile.flush()
+
+        try:
+            time.sleep(self.config.ttft)
+            delay = 1.0 / self.config.token_rate if self.config.token_rate > 0 else 0
+            for ch in REPLY_TEXT:
+                event = {"choices": [{"delta": {"content": ch}}]}
+                write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                time.sleep(delay)
+            write_chunk(b"data: [DONE]\n\n")
+            write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端停止生成
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地假上游 (视频 / 对话 / 绘图)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9900)
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的基础延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟随机抖动上限 (秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="返回 500 的概率 (0~1)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="流式回复速率 (token/秒)")
+    parser.add_argument("--ttft", type=float, default=0.3, help="流式回复首 token 延迟 (秒)")
+    parser.add_argument("--video-seconds", type=float, default=5.0, help="视频生成耗时 (秒)")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                        token_rate=args.token_rate, ttft=args.ttft, video_seconds=args.video_seconds)
+    upstream = MockUpstream(config, args.host, args.port)
+    print(f"✅ 假上游已启动: {upstream.url}")
+    try:
+        upstream.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
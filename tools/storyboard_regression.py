@@ -0,0 +1,178 @@
+"""
+分镜解析回归检查：拿 app.py 里的 StoryboardParser 和换掉之前的整段正则实现逐条对比。
+镜头列表、通用前缀、复制块三项都要一致；每条文本既整段喂入，也按随机长度切片喂入 (模拟流式回复)。
+
+语料：
+  - tools/storyboard_corpus/ 下的样例回复 (表格、编号镜头、跨行写法、[Style Anchor] 行、普通对话、边界情况)
+  - 命令行额外给的文件或目录
+  - --mongo-uri：从数据库里取最近的助手回复
+  - --fuzz N：用常见片段随机拼出 N 条文本
+
+用法：
+    python tools/storyboard_regression.py
+    python tools/storyboard_regression.py --fuzz 20000
+    python tools/storyboard_regression.py --mongo-uri mongodb://localhost:27017 --limit 2000
+    python tools/storyboard_regression.py path/to/replies/
+"""
+import argparse
+import ast
+import os
+import random
+import re
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(TOOLS_DIR), "app.py")
+CORPUS_DIR = os.path.join(TOOLS_DIR, "storyboard_corpus")
+DB_NAME = "ai_workbench_db"
+
+# ---- 旧版实现 (替换前的整段正则，原样保留作为对照，不要改) ----
+ANCHOR_PATTERN = re.compile(r'(?:通用(?:Prompt)?(?:前缀)?|Style Anchor).*?[:：]\s*(.*)', re.IGNORECASE)
+SCENE_LIST_PATTERN = re.compile(r'(?:^|\n)\s*(?:[•\*\-\d\.]+)\s*(?:镜头|Scene).*?[:：]\s*(\[Style Anchor\].*?)(?=\n|$)', re.IGNORECASE)
+STYLE_ANCHOR_LINE_PATTERN = re.compile(r'(\[Style Anchor\].*?)(?=\n|$)')
+COPY_BLOCK_PATTERN = re.compile(r'(?:^|\n)\s*(?:\d+\.\s*)?【(.*?)】([\s\S]*?)(?=(?:\n\s*(?:\d+\.\s*)?【)|$)')
+
+
+def legacy_extract_prompts(text):
+    prompts = []
+    anchor_content = ""
+    anchor_match = ANCHOR_PATTERN.search(text)
+    if anchor_match:
+        raw_anchor = anchor_match.group(1).strip().split('\n')[0]
+        anchor_content = raw_anchor.replace('`', '').replace(')', '').replace('）', '').strip()
+
+    for line in text.split('\n'):
+        if '|' in line:
+            parts = [p.strip() for p in line.split('|') if p.strip()]
+            if len(parts) >= 3 and '---' not in line:
+                candidate = parts[2]
+                if len(candidate) > 10 and not candidate.startswith('视觉详细指令'):
+                    prompts.append(candidate)
+    if not prompts:
+        prompts = SCENE_LIST_PATTERN.findall(text)
+    if not prompts:
+        prompts = STYLE_ANCHOR_LINE_PATTERN.findall(text)
+    return [p.replace('**', '').strip() for p in prompts], anchor_content
+
+
+def legacy_extract_copy_blocks(text):
+    blocks = []
+    for title, content in COPY_BLOCK_PATTERN.findall(text):
+        if "文案" in title or "粘贴" in title or "脚本" in title:
+            blocks.append({"title": title, "content": content.strip()})
+    return blocks
+
+
+def legacy_result(text):
+    prompts, anchor = legacy_extract_prompts(text)
+    return prompts, anchor, legacy_extract_copy_blocks(text)
+
+
+# ---- 新版实现：只从 app.py 里取出 StoryboardParser 和它用到的常量，不运行页面 ----
+def load_parser(path=APP_PATH):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    cls = next((node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == "StoryboardParser"), None)
+    if cls is None:
+        sys.exit(f"{path} 里找不到 StoryboardParser")
+    used = {node.id for node in ast.walk(cls) if isinstance(node, ast.Name)}
+    constants = [node for node in tree.body if isinstance(node, ast.Assign)
+                 and any(isinstance(t, ast.Name) and t.id in used for t in node.targets)]
+    module = ast.Module(body=[*constants, cls], type_ignores=[])
+    namespace = {"re": re}
+    exec(compile(module, path, "exec"), namespace)
+    return namespace["StoryboardParser"]
+
+
+def parse_whole(parser_cls, text):
+    return parser_cls().feed(text).close().result()
+
+
+def parse_chunked(parser_cls, text, rng):
+    parser, i = parser_cls(), 0
+    while i < len(text):
+        n = rng.randint(1, 16)
+        parser.feed(text[i:i + n])
+        i += n
+    return parser.close().result()
+
+
+# ---- 语料 ----
+def read_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full = os.path.join(path, name)
+                if os.path.isfile(full):
+                    yield from read_paths([full])
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield os.path.relpath(path), f.read()
+
+
+def read_mongo(uri, limit):
+    import pymongo
+    collection = pymongo.MongoClient(uri)[DB_NAME]["chat_messages"]
+    docs = collection.find({"role": "assistant", "content": {"$type": "string"}}, {"content": 1}).sort("created_at", -1).limit(limit)
+    for doc in docs:
+        yield f"db:{doc['_id']}", doc["content"]
+
+
+FUZZ_FRAGMENTS = [
+    "| 1 | 远景 | [Style Anchor] 一个女孩在雨夜中行走，霓虹灯倒影 |", "|---|---|---|", "| 镜头 | 景别 | 视觉详细指令 |",
+    "| a | b | short |", "1. 镜头1：[Style Anchor] cat on roof", "- Scene 2: [style anchor] dog runs",
+    "* 镜头3: text: [Style Anchor] x", "2.", "-", "镜头4：", "[Style Anchor] lone anchor line", "  [STYLE ANCHOR] upper",
+    "通用前缀：`cinematic, 4k`)", "Style Anchor:", "Style anchor (通用Prompt前缀)： warm light）", "", "   ",
+    "【文案1】 hello", "1. 【脚本】", "【标题】 not copy", "正文内容 **bold**", "3. 【粘贴区", "【文案2】", "1.",
+    "text 【文案3】 inline", "Scene：", "镜头5 : : [Style Anchor] double", "\r", "通用", "：",
+    "• 镜头6：\t[Style Anchor]  tabs  ", "12. Scene 7: [Style Anchor] **bold** end",
+]
+
+
+def fuzz_texts(count, rng):
+    for i in range(count):
+        text = '\n'.join(rng.choice(FUZZ_FRAGMENTS) for _ in range(rng.randint(0, 12)))
+        if rng.random() < 0.2:
+            text += '\n'
+        yield f"fuzz:{i}", text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StoryboardParser 和旧版正则实现的对比")
+    parser.add_argument("paths", nargs="*", help="额外的语料文件或目录 (每个文件是一条回复)")
+    parser.add_argument("--no-corpus", action="store_true", help="不跑自带的 storyboard_corpus")
+    parser.add_argument("--mongo-uri", default="", help="从这个数据库取最近的助手回复")
+    parser.add_argument("--limit", type=int, default=1000, help="从数据库取多少条")
+    parser.add_argument("--fuzz", type=int, default=0, help="另外随机拼多少条文本")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    parser_cls = load_parser()
+    rng = random.Random(args.seed)
+    sources = [read_paths(([] if args.no_corpus else [CORPUS_DIR]) + args.paths)]
+    if args.mongo_uri:
+        sources.append(read_mongo(args.mongo_uri, args.limit))
+    if args.fuzz:
+        sources.append(fuzz_texts(args.fuzz, rng))
+
+    checked, failures = 0, []
+    for source in sources:
+        for name, text in source:
+            expected = legacy_result(text)
+            for mode, actual in (("整段", parse_whole(parser_cls, text)), ("分片", parse_chunked(parser_cls, text, rng))):
+                if actual != expected:
+                    failures.append((name, mode, text, expected, actual))
+            checked += 1
+            if name.startswith(("fuzz:", "db:")):
+                continue
+            prompts, anchor, blocks = expected
+            print(f"  {name}: {len(prompts)} 个镜头, 前缀 {'有' if anchor else '无'}, {len(blocks)} 个复制块")
+
+    for name, mode, text, expected, actual in failures[:10]:
+        print(f"\n❌ {name} ({mode}) 结果不一致\n  输入: {text[:300]!r}\n  旧版: {expected!r}\n  新版: {actual!r}")
+    print(f"\n共检查 {checked} 条，{len(failures)} 处不一致")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()